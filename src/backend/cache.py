@@ -0,0 +1,331 @@
+# src/backend/cache.py
+
+import gzip
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from metrics import cache_requests, span
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip from the standard library is the fallback
+    zstandard = None
+
+if zstandard is not None:
+    COMPRESSED_SUFFIX = ".zst"
+    _compressor = zstandard.ZstdCompressor(level=3)
+    _decompressor = zstandard.ZstdDecompressor()
+
+    def compress(data: bytes) -> bytes:
+        return _compressor.compress(data)
+
+    def decompress(data: bytes) -> bytes:
+        return _decompressor.decompress(data)
+else:
+    COMPRESSED_SUFFIX = ".gz"
+
+    def compress(data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=6)
+
+    def decompress(data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+def atomic_write(path: str, data: bytes):
+    """
+    Write a file via a temp file in the same directory and a rename, so readers never see a partial file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _hit_ratio(hits: int, misses: int) -> float:
+    lookups = hits + misses
+    return hits / lookups if lookups else 0.0
+
+
+class MemoryLRU:
+    """
+    In-process LRU cache of strings, bounded by the total encoded size of its values.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # Never let one oversized value flush the whole tier
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes_used -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes_used += size
+
+            while self.bytes_used > self.max_bytes:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self.bytes_used -= self._sizes.pop(evicted_key)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": _hit_ratio(self.hits, self.misses),
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class DiskCache:
+    """
+    Compressed on-disk cache of byte values, bounded in total size with LRU eviction.
+    Entries are tracked in a SQLite index inside the cache directory, so lookups and eviction never
+    scan the directory. Safe to share between threads and between worker processes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, name: str = "disk"):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.sqlite3")
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not be shared across a fork, so each process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._create_size_total(self._conn)
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _create_size_total(conn: sqlite3.Connection):
+        # Running total of the entries' sizes, kept by triggers so every process sharing the index (and every
+        # insert, replace and removal) updates it, without summing the whole table on each put
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) "
+                         "SELECT 'bytes_used', COALESCE(SUM(size), 0) FROM entries")
+            conn.execute("CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN "
+                         "UPDATE meta SET value = value + NEW.size WHERE name = 'bytes_used'; END")
+            conn.execute("CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN "
+                         "UPDATE meta SET value = value + NEW.size - OLD.size WHERE name = 'bytes_used'; END")
+            conn.execute("CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN "
+                         "UPDATE meta SET value = value - OLD.size WHERE name = 'bytes_used'; END")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _bytes_used(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM meta WHERE name = 'bytes_used'").fetchone()[0]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{COMPRESSED_SUFFIX}")
+
+    def _remove(self, conn: sqlite3.Connection, key: str):
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """
+        Return the value stored under key, or None on a miss.
+        :param max_age: treat entries created more than this many seconds ago as expired and remove them
+        """
+        with span("cache_lookup", cache=self.name):
+            data = self._get(key, max_age)
+        cache_requests.inc(cache=self.name, result="miss" if data is None else "hit")
+        return data
+
+    def _get(self, key: str, max_age: Optional[float]) -> Optional[bytes]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            if max_age is not None and row[0] < time.time() - max_age:
+                self._remove(conn, key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+        # The file is read and decompressed outside the lock. Files are replaced atomically, so a concurrent
+        # put is seen whole or not at all
+        try:
+            with open(self._path(key), "rb") as f:
+                data = decompress(f.read())
+        except FileNotFoundError:
+            # Evicted by another thread or process since the lookup; the caller's put restores it
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logging.warning(f"Dropping unreadable cache entry {key} in {self.directory}: {e}")
+            with self._lock:
+                self._remove(self._connection(), key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._connection().execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return data
+
+    def put(self, key: str, value: bytes):
+        with span("cache_write", cache=self.name):
+            data = compress(value)
+            # The index row is written after the file, so readers never find a row without its file
+            atomic_write(self._path(key), data)
+            with self._lock:
+                conn = self._connection()
+                now = time.time()
+                conn.execute("INSERT INTO entries (key, size, created, accessed) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (key) DO UPDATE SET size = excluded.size, created = excluded.created, "
+                             "accessed = excluded.accessed", (key, len(data), now, now))
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = self._bytes_used(conn)
+        if total <= self.max_bytes:
+            return
+
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._remove(conn, key)
+            total -= size
+            self.evictions += 1
+
+    def expire(self, max_age: float) -> int:
+        """
+        Remove entries created more than max_age seconds ago.
+        :return: the number of entries removed
+        """
+        with self._lock:
+            conn = self._connection()
+            expired = conn.execute("SELECT key FROM entries WHERE created < ?",
+                                   (time.time() - max_age,)).fetchall()
+            for (key,) in expired:
+                logging.info(f"Removing expired cache entry: {key}")
+                self._remove(conn, key)
+            self.evictions += len(expired)
+            return len(expired)
+
+    def counts(self) -> Tuple[int, int, int]:
+        """
+        Return this process's (hits, misses, evictions) counts.
+        """
+        with self._lock:
+            return self.hits, self.misses, self.evictions
+
+    def merge_counts(self, hits: int, misses: int, evictions: int):
+        """
+        Add counts measured by another process sharing this cache, e.g. an extraction worker.
+        """
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            bytes_used = self._bytes_used(conn)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": _hit_ratio(self.hits, self.misses),
+            "entries": entries,
+            "bytes_used": bytes_used,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache:
+    """
+    Two-tier text cache: a hot in-process LRU in front of a compressed, size-bounded disk cache.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int, name: str = "tiered"):
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskCache(directory, disk_bytes, name=name)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            cache_requests.inc(cache=self.disk.name, result="memory_hit")
+            return value
+
+        data = self.disk.get(key)
+        if data is None:
+            return None
+        value = data.decode("utf-8")
+        self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        self.memory.put(key, value)
+        self.disk.put(key, value.encode("utf-8"))
+
+    def stats(self) -> dict:
+        return {"memory": self.memory.stats(), "disk": self.disk.stats()}
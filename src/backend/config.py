@@ -0,0 +1,104 @@
+# src/backend/config.py
+
+import os
+from typing import Dict
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """
+    Parse a "key=value,key=value" setting.
+    """
+    return dict(pair.strip().split("=", 1) for pair in value.split(",") if pair.strip())
+
+
+CACHE_DIR = os.getenv("ATHENA_CACHE_DIR", ".file_cache")
+
+LOG_LEVEL = os.getenv("ATHENA_LOG_LEVEL", "INFO").upper()
+
+# Add a Server-Timing header with the stage breakdown to every response, not only when the client
+# sends an X-Athena-Timing header
+TIMING_HEADER = os.getenv("ATHENA_TIMING_HEADER", "").lower() in ("1", "true", "yes")
+
+# Size bounds of the extraction caches, in bytes (disk sizes are after compression)
+DOCUMENT_CACHE_MEMORY_BYTES = int(os.getenv("ATHENA_DOCUMENT_CACHE_MEMORY_BYTES", 64 * 1024 * 1024))
+DOCUMENT_CACHE_DISK_BYTES = int(os.getenv("ATHENA_DOCUMENT_CACHE_DISK_BYTES", 512 * 1024 * 1024))
+PAGE_CACHE_DISK_BYTES = int(os.getenv("ATHENA_PAGE_CACHE_DISK_BYTES", 1024 * 1024 * 1024))
+OCR_CACHE_DISK_BYTES = int(os.getenv("ATHENA_OCR_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+INDEX_CACHE_DISK_BYTES = int(os.getenv("ATHENA_INDEX_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+
+# Retrieval: chunk size used for the lexical index, in tokens (the context budget is set with map-reduce below)
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("ATHENA_RETRIEVAL_CHUNK_TOKENS", 400))
+
+# Uploads are hashed and spooled to disk in chunks of this many bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv("ATHENA_UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+# Number of processes used to extract pages in parallel (defaults to one per core)
+EXTRACTION_WORKERS = int(os.getenv("ATHENA_EXTRACTION_WORKERS", os.cpu_count() or 1))
+
+# Background extraction jobs: concurrent jobs, and how long finished jobs stay queryable (seconds)
+JOB_WORKERS = int(os.getenv("ATHENA_JOB_WORKERS", 2))
+JOB_RETENTION = int(os.getenv("ATHENA_JOB_RETENTION", 3600))
+
+# Tesseract language data directory, exported as TESSDATA_PREFIX at startup when set
+TESSDATA_PREFIX = os.getenv("ATHENA_TESSDATA_PREFIX")
+# Preload the PDF and OCR stacks at startup instead of on the first upload
+WARMUP = os.getenv("ATHENA_WARMUP", "").lower() in ("1", "true", "yes")
+
+# Embedded images below either threshold are skipped, their OCR output is reliably empty
+OCR_MIN_IMAGE_AREA = int(os.getenv("ATHENA_OCR_MIN_IMAGE_AREA", 64 * 64))
+OCR_MIN_IMAGE_BYTES = int(os.getenv("ATHENA_OCR_MIN_IMAGE_BYTES", 1024))
+
+# Models used for the streaming and non-streaming generation endpoints
+STREAM_MODEL = os.getenv("ATHENA_STREAM_MODEL", "chatgpt-4o-latest")
+PROCESS_MODEL = os.getenv("ATHENA_PROCESS_MODEL", "o1")
+
+# Initial limit on OpenAI calls in flight per model across all requests, batch modes included.
+# The LLM gateway adapts it between LLM_MIN_CONCURRENCY and LLM_MAX_CONCURRENCY
+GENERATION_CONCURRENCY = int(os.getenv("ATHENA_GENERATION_CONCURRENCY", 8))
+LLM_MIN_CONCURRENCY = int(os.getenv("ATHENA_LLM_MIN_CONCURRENCY", 1))
+LLM_MAX_CONCURRENCY = int(os.getenv("ATHENA_LLM_MAX_CONCURRENCY", 32))
+
+# HTTP connection pool of the OpenAI client
+LLM_MAX_CONNECTIONS = int(os.getenv("ATHENA_LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ATHENA_LLM_MAX_KEEPALIVE_CONNECTIONS", 32))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("ATHENA_LLM_KEEPALIVE_EXPIRY", 30))
+LLM_CONNECT_TIMEOUT = float(os.getenv("ATHENA_LLM_CONNECT_TIMEOUT", 5))
+
+# OpenAI call timeout in seconds (for streams, the longest gap between chunks), overridable per model
+# as "model=seconds,..."
+LLM_TIMEOUT = float(os.getenv("ATHENA_LLM_TIMEOUT", 120))
+LLM_MODEL_TIMEOUTS = {model: float(seconds) for model, seconds in
+                      _parse_mapping(os.getenv("ATHENA_LLM_MODEL_TIMEOUTS", "o1=300")).items()}
+
+# 429s, timeouts, connection errors and 5xx are retried with jittered exponential backoff (seconds)
+LLM_MAX_RETRIES = int(os.getenv("ATHENA_LLM_MAX_RETRIES", 4))
+LLM_RETRY_BASE_DELAY = float(os.getenv("ATHENA_LLM_RETRY_BASE_DELAY", 0.5))
+LLM_RETRY_MAX_DELAY = float(os.getenv("ATHENA_LLM_RETRY_MAX_DELAY", 20))
+
+# Calls that allow it switch to the model's fallback ("model=fallback,...") once LLM_FALLBACK_QUEUE_DEPTH
+# calls are already queued for it; 0 disables fallback
+LLM_FALLBACK_MODELS = _parse_mapping(os.getenv("ATHENA_LLM_FALLBACK_MODELS", "o1=gpt-4o"))
+LLM_FALLBACK_QUEUE_DEPTH = int(os.getenv("ATHENA_LLM_FALLBACK_QUEUE_DEPTH", 0))
+
+# Streamed output is sent in flushes of at least STREAM_FLUSH_CHARS characters or every STREAM_FLUSH_INTERVAL seconds
+STREAM_FLUSH_CHARS = int(os.getenv("ATHENA_STREAM_FLUSH_CHARS", 80))
+STREAM_FLUSH_INTERVAL = float(os.getenv("ATHENA_STREAM_FLUSH_INTERVAL", 0.1))
+
+# Generated responses are reused for identical requests for RESPONSE_CACHE_TTL seconds
+RESPONSE_CACHE_TTL = int(os.getenv("ATHENA_RESPONSE_CACHE_TTL", 7 * 86400))
+RESPONSE_CACHE_DISK_BYTES = int(os.getenv("ATHENA_RESPONSE_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+
+# Map-reduce generation: contexts above MAP_WINDOW_TOKENS are condensed window by window before the final call
+MAP_WINDOW_TOKENS = int(os.getenv("ATHENA_MAP_WINDOW_TOKENS", 60000))
+# Coverage budget: uploads up to this many tokens are used whole, condensed by map-reduce when they exceed one
+# window; larger ones are first trimmed by retrieval to their most relevant chunks (defaults to four windows)
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("ATHENA_RETRIEVAL_TOKEN_BUDGET", 4 * MAP_WINDOW_TOKENS))
+MAP_CONCURRENCY = int(os.getenv("ATHENA_MAP_CONCURRENCY", 4))
+MAP_MODEL = os.getenv("ATHENA_MAP_MODEL", "gpt-4o-mini")
+MAP_MAX_TOKENS = int(os.getenv("ATHENA_MAP_MAX_TOKENS", 2000))
+MAP_MAX_ROUNDS = int(os.getenv("ATHENA_MAP_MAX_ROUNDS", 3))
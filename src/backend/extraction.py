@@ -0,0 +1,340 @@
+# src/backend/extraction.py
+
+import hashlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache import DiskCache
+from config import (CACHE_DIR, EXTRACTION_WORKERS, OCR_CACHE_DISK_BYTES, OCR_MIN_IMAGE_AREA, OCR_MIN_IMAGE_BYTES,
+                    PAGE_CACHE_DISK_BYTES)
+from metrics import MetricEvents, observe_stage, record_metrics, replay_metrics
+
+page_cache = DiskCache(os.path.join(CACHE_DIR, "pages"), PAGE_CACHE_DISK_BYTES, name="pages")
+ocr_cache = DiskCache(os.path.join(CACHE_DIR, "ocr"), OCR_CACHE_DISK_BYTES, name="ocr")
+
+# (stage, seconds) pairs measured while extracting. Workers return them, since metrics recorded in a
+# worker process would never reach the API process
+Timings = List[Tuple[str, float]]
+# Cache name -> (hits, misses, evictions) counted by a worker, for the same reason
+CacheCounts = Dict[str, Tuple[int, int, int]]
+# Bump when the extraction output format changes so stale page entries are ignored
+PAGE_CACHE_VERSION = "2"
+
+# Each worker gets several page ranges so one OCR-heavy range doesn't leave the others idle
+RANGES_PER_WORKER = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class ExtractionError(Exception):
+    """
+    Raised when a PDF can't be extracted. Callers must not cache anything for it.
+    """
+
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    """
+    Return the shared, bounded process pool used for page extraction, creating it on first use.
+    Workers are spawned rather than forked: the API process is threaded, and a forked worker could inherit
+    a lock held by another thread (cache, metrics) or the parent's SQLite connections.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _discard_broken_executor(executor: ProcessPoolExecutor):
+    """
+    Drop a pool broken by a dead worker (e.g. a MuPDF crash or an OOM kill), so the next call creates a new one.
+    """
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extraction_executor():
+    """
+    Shut down the shared process pool, if it was started.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def extract_text_from_image(image_bytes: bytes) -> str:
+    """
+    Extract text from an image using OCR (Optical Character Recognition).
+    The image is decoded from memory rather than round-tripped through a temp file.
+    :param image_bytes:
+    """
+    # The OCR stack is imported on first use, so importing the API doesn't load it
+    import pytesseract
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return pytesseract.image_to_string(img)
+    except Exception as e:
+        logging.warning(f"Error during OCR processing: {e}")
+        return ""
+
+
+def warm_up():
+    """
+    Load the PDF and OCR stacks ahead of the first upload: import them, open one in-memory PDF and run
+    Tesseract once on a blank image so its language data is read (and left in the OS page cache).
+    Raises if Tesseract is not installed.
+    """
+    import pymupdf
+    import pytesseract
+    from PIL import Image
+
+    with pymupdf.open() as doc:
+        doc.new_page()
+        pdf_bytes = doc.tobytes()
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        doc[0].get_text()
+    with Image.new("L", (64, 64), color=255) as img:
+        pytesseract.image_to_string(img)
+
+
+def image_digest(doc, xref: int) -> str:
+    """
+    Content hash of an embedded image's raw stream, stable across documents and xref renumbering.
+    """
+    return hashlib.sha256(doc.xref_stream_raw(xref) or b"").hexdigest()
+
+
+def page_cache_key(doc, page, digests: Dict[int, str]) -> str:
+    """
+    Content address of a page: its content stream plus the images it draws.
+    Images are identified by a digest of their stream rather than their xref number, since xrefs are
+    renumbered when a deck is re-saved with a slide added.
+    :param digests: image digests by xref, filled in as images are hashed and reused by OCR
+    """
+    hasher = hashlib.sha256(PAGE_CACHE_VERSION.encode())
+    hasher.update(page.read_contents())
+    for img in page.get_images(full=True):
+        xref = img[0]
+        if xref not in digests:
+            digests[xref] = image_digest(doc, xref)
+        hasher.update(b"\0img\0")
+        hasher.update(digests[xref].encode())
+    return hasher.hexdigest()
+
+
+def _read_cache_entry(cache: DiskCache, key: str) -> Optional[Dict]:
+    data = cache.get(key)
+    return json.loads(data) if data is not None else None
+
+
+def _write_cache_entry(cache: DiskCache, key: str, value: Dict):
+    cache.put(key, json.dumps(value).encode("utf-8"))
+
+
+def _ocr_image(doc, img: tuple, digests: Dict[int, str], ocr_results: Dict[int, str], timings: Timings) -> str:
+    """
+    OCR an embedded image, deduplicated by xref within the document (ocr_results) and by content
+    hash across documents (the persistent OCR cache). Images too small to hold readable text are skipped.
+    """
+    xref, width, height = img[0], img[2], img[3]
+    if xref in ocr_results:
+        return ocr_results[xref]
+
+    if width * height < OCR_MIN_IMAGE_AREA:
+        ocr_results[xref] = ""
+        return ""
+
+    digest = digests.get(xref) or image_digest(doc, xref)
+    cached = _read_cache_entry(ocr_cache, digest)
+    if cached is not None:
+        image_text = cached["text"]
+    else:
+        image_bytes = doc.extract_image(xref)["image"]
+        image_text = ""
+        if len(image_bytes) >= OCR_MIN_IMAGE_BYTES:
+            start = time.perf_counter()
+            image_text = extract_text_from_image(image_bytes)
+            timings.append(("image_ocr", time.perf_counter() - start))
+        _write_cache_entry(ocr_cache, digest, {"text": image_text})
+
+    ocr_results[xref] = image_text
+    return image_text
+
+
+def _extract_page(doc, page, digests: Dict[int, str], ocr_results: Dict[int, str], timings: Timings,
+                  ocr: bool = True) -> Dict:
+    """
+    Extract the text layer and OCR'd image text of a single page.
+    The result is untagged so it can be cached independently of the document name and page number.
+    """
+    start = time.perf_counter()
+    # PyMuPDF has no markdown output, the plain text layer in reading order is what gets tagged
+    page_content = {"text": page.get_text("text", sort=True), "images": []}
+    timings.append(("page_text", time.perf_counter() - start))
+    if not ocr:
+        return page_content
+
+    for img in page.get_images(full=True):
+        image_text = _ocr_image(doc, img, digests, ocr_results, timings)
+        if image_text.strip():
+            page_content["images"].append(image_text)
+
+    return page_content
+
+
+def format_page(page_content: Dict, document_name: str, page_num: int) -> List[str]:
+    """
+    Tag a page's text and image text with its source, as referenced by the prompts.
+    """
+    entries = []
+    if page_content["text"].strip():
+        entries.append(f"[{document_name} Page {page_num + 1}]\n{page_content['text']}")
+    for image_text in page_content["images"]:
+        entries.append(f"[{document_name} Page {page_num + 1}] {image_text}")
+    return entries
+
+
+def _extract_pages(file_path: str, page_nums: List[int], keys: List[Optional[str]], digests: Dict[int, str],
+                   ocr: bool = True) -> Tuple[List[Dict], Timings, MetricEvents, CacheCounts]:
+    """
+    Extract and cache the given pages of a PDF. Runs inside a worker process, so it opens its own document handle.
+    The parent passes the pages' cache keys and the image digests it computed, so nothing is hashed twice.
+    Text-only results (ocr=False) are incomplete, so they are not cached.
+    The worker's cache metrics and counts are returned along with the timings for the parent to record.
+    """
+    import pymupdf  # PyMuPDF for PDF processing, imported on first use
+
+    caches = (page_cache, ocr_cache)
+    counts_before = [cache.counts() for cache in caches]
+    doc = pymupdf.open(file_path)
+    try:
+        extracted = []
+        ocr_results: Dict[int, str] = {}
+        timings: Timings = []
+        with record_metrics() as events:
+            for page_num, key in zip(page_nums, keys):
+                page_content = _extract_page(doc, doc[page_num], digests, ocr_results, timings, ocr)
+                if ocr:
+                    _write_cache_entry(page_cache, key, page_content)
+                extracted.append(page_content)
+        cache_counts = {cache.name: tuple(after - before for after, before in zip(cache.counts(), counts))
+                        for cache, counts in zip(caches, counts_before)}
+        return extracted, timings, events, cache_counts
+    finally:
+        doc.close()
+
+
+def split_page_ranges(page_nums: List[int], workers: int) -> List[List[int]]:
+    """
+    Split the pages to extract into contiguous groups to distribute across workers.
+    """
+    if not page_nums:
+        return []
+    range_count = min(len(page_nums), max(1, workers) * RANGES_PER_WORKER)
+    range_size = math.ceil(len(page_nums) / range_count)
+    return [page_nums[start:start + range_size] for start in range(0, len(page_nums), range_size)]
+
+
+def extract_markdown_from_pdf(file_path: str, document_name: str, ocr: bool = True,
+                              progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Extract text and images from a PDF file and convert it to markdown format.
+    Pages found in the page cache are reused; the rest are extracted in parallel on the shared
+    process pool and reassembled in page order.
+    Raises ExtractionError when the PDF can't be extracted.
+    :param file_path:
+    :param document_name:
+    :param ocr: whether to OCR embedded images; without it only the (fast) text layer is extracted
+    :param progress: called with (pages done, pages total) as pages complete
+    """
+    import pymupdf
+
+    try:
+        with pymupdf.open(file_path) as doc:
+            page_count = len(doc)
+            digests: Dict[int, str] = {}
+            if ocr:
+                keys: List[Optional[str]] = [page_cache_key(doc, doc[page_num], digests)
+                                             for page_num in range(page_count)]
+                # Per-page hits and misses are counted by the page cache's metrics
+                pages: List[Optional[Dict]] = [_read_cache_entry(page_cache, key) for key in keys]
+            else:
+                # Text-only results are never cached, so don't hash every image stream before the text is out
+                keys = [None] * page_count
+                pages = [None] * page_count
+
+            missing = [page_num for page_num, page_content in enumerate(pages) if page_content is None]
+            if ocr:
+                logging.info(f"Page cache for {document_name}: {page_count - len(missing)} hits, "
+                             f"{len(missing)} misses")
+            pages_done = page_count - len(missing)
+            if progress:
+                progress(pages_done, page_count)
+
+            timings: Timings = []
+            # A single page or a single worker isn't worth the inter-process overhead
+            if len(missing) == 1 or (missing and EXTRACTION_WORKERS <= 1):
+                ocr_results: Dict[int, str] = {}
+                for page_num in missing:
+                    pages[page_num] = _extract_page(doc, doc[page_num], digests, ocr_results, timings, ocr)
+                    if ocr:
+                        _write_cache_entry(page_cache, keys[page_num], pages[page_num])
+                    pages_done += 1
+                    if progress:
+                        progress(pages_done, page_count)
+                missing = []
+
+        # A pool broken by a dead worker is replaced and the remaining pages retried once
+        for attempt in range(2):
+            if not missing:
+                break
+            executor = get_extraction_executor()
+            page_groups = split_page_ranges(missing, EXTRACTION_WORKERS)
+            futures = {executor.submit(_extract_pages, file_path, page_group,
+                                       [keys[page_num] for page_num in page_group], digests, ocr): page_group
+                       for page_group in page_groups}
+            try:
+                # Results are slotted back by page number, so completion order doesn't matter
+                for future in as_completed(futures):
+                    page_group = futures[future]
+                    extracted, worker_timings, worker_events, cache_counts = future.result()
+                    for page_num, page_content in zip(page_group, extracted):
+                        pages[page_num] = page_content
+                    timings.extend(worker_timings)
+                    replay_metrics(worker_events)
+                    for cache in (page_cache, ocr_cache):
+                        cache.merge_counts(*cache_counts[cache.name])
+                    pages_done += len(page_group)
+                    if progress:
+                        progress(pages_done, page_count)
+            except BrokenProcessPool:
+                _discard_broken_executor(executor)
+                if attempt:
+                    raise
+                logging.warning(f"Extraction pool broke while extracting {document_name}, retrying on a new pool")
+            missing = [page_num for page_num in missing if pages[page_num] is None]
+
+        for stage, seconds in timings:
+            observe_stage(stage, seconds)
+
+        markdown_content = []
+        for page_num, page_content in enumerate(pages):
+            markdown_content.extend(format_page(page_content, document_name, page_num))
+
+        return "\n".join(filter(None, markdown_content))
+
+    except Exception as e:
+        logging.error(f"Error processing PDF {document_name}: {e}")
+        raise ExtractionError(f"Could not extract {document_name}: {e}") from e
@@ -0,0 +1,355 @@
+# src/backend/gateway.py
+
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from typing import TYPE_CHECKING, AsyncGenerator, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+from config import (GENERATION_CONCURRENCY, LLM_CONNECT_TIMEOUT, LLM_FALLBACK_MODELS, LLM_FALLBACK_QUEUE_DEPTH,
+                    LLM_KEEPALIVE_EXPIRY, LLM_MAX_CONCURRENCY, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    LLM_MAX_RETRIES, LLM_MIN_CONCURRENCY, LLM_MODEL_TIMEOUTS, LLM_RETRY_BASE_DELAY,
+                    LLM_RETRY_MAX_DELAY, LLM_TIMEOUT)
+from metrics import (llm_concurrency_limit, llm_fallbacks, llm_in_flight, llm_queue_depth, llm_queue_wait_seconds,
+                     llm_retries, observe_stage, record_openai_call)
+from retrieval import estimate_tokens
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletion
+
+# Durations of the x-ratelimit-reset-* headers, e.g. "1s", "6m0s" or "20ms"
+DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse an OpenAI rate limit reset duration into seconds.
+    """
+    if not value:
+        return None
+    parts = DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitTracker:
+    """
+    Request and token budget of one model, taken from the x-ratelimit-* headers of its responses and
+    reserved locally by calls in between. An unknown budget (no response yet, or past its reset) is unlimited.
+    """
+
+    def __init__(self):
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        # Callers queue here in order while the budget is exhausted
+        self._lock = asyncio.Lock()
+
+    def _wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        if self.remaining_requests is not None and self.remaining_requests < 1:
+            if now < self.requests_reset_at:
+                wait = self.requests_reset_at - now
+            else:
+                self.remaining_requests = None
+        if self.remaining_tokens is not None and self.remaining_tokens < tokens:
+            if now < self.tokens_reset_at:
+                wait = max(wait, self.tokens_reset_at - now)
+            else:
+                self.remaining_tokens = None
+        return wait
+
+    async def acquire(self, tokens: int):
+        """
+        Wait until the budget allows one more request of about `tokens` tokens, then reserve it.
+        """
+        async with self._lock:
+            wait = self._wait_time(tokens)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._wait_time(tokens)
+            if self.remaining_requests is not None:
+                self.remaining_requests -= 1
+            if self.remaining_tokens is not None:
+                self.remaining_tokens -= tokens
+
+    def update(self, headers: Mapping[str, str]):
+        """
+        Replace the local budget with the one reported in a response's headers.
+        """
+        now = time.monotonic()
+        remaining_requests = _parse_int(headers.get("x-ratelimit-remaining-requests"))
+        if remaining_requests is not None:
+            self.remaining_requests = remaining_requests
+            self.requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0)
+        remaining_tokens = _parse_int(headers.get("x-ratelimit-remaining-tokens"))
+        if remaining_tokens is not None:
+            self.remaining_tokens = remaining_tokens
+            self.tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+
+    def stats(self) -> dict:
+        return {"remaining_requests": self.remaining_requests, "remaining_tokens": self.remaining_tokens}
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: each successful call raises the limit by 1/limit (about +1 per round of calls),
+    each rate limited or timed out call halves it. Waiters are served in arrival order.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, on_change: Optional[Callable[[], None]] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._on_change = on_change or (lambda: None)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self._on_change()
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._on_change()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter was cancelled, pass it on
+                self.release(overloaded=False, adjust=False)
+            else:
+                self._waiters.remove(future)
+                self._on_change()
+            raise
+
+    def release(self, overloaded: bool, adjust: bool = True):
+        self.in_flight -= 1
+        if adjust:
+            if overloaded:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        self._on_change()
+
+
+class _Lane:
+    """
+    Admission state of one model.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.rate_limit = RateLimitTracker()
+        self.concurrency = AdaptiveConcurrency(GENERATION_CONCURRENCY, LLM_MIN_CONCURRENCY, LLM_MAX_CONCURRENCY,
+                                               on_change=self.report)
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def report(self):
+        llm_queue_depth.set(self.concurrency.waiting, model=self.model)
+        llm_in_flight.set(self.concurrency.in_flight, model=self.model)
+        llm_concurrency_limit.set(self.concurrency.limit, model=self.model)
+
+    async def acquire(self, tokens: int):
+        start = time.perf_counter()
+        await self.concurrency.acquire()
+        try:
+            await self.rate_limit.acquire(tokens)
+        except BaseException:
+            self.concurrency.release(overloaded=False, adjust=False)
+            raise
+        wait = time.perf_counter() - start
+        self.calls += 1
+        self.wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        llm_queue_wait_seconds.observe(wait, model=self.model)
+        observe_stage("llm_queue", wait, model=self.model)
+
+    def release(self, overloaded: bool):
+        self.concurrency.release(overloaded)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.concurrency.waiting,
+            "in_flight": self.concurrency.in_flight,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "calls": self.calls,
+            "mean_wait_s": self.wait_seconds / self.calls if self.calls else 0.0,
+            "max_wait_s": self.max_wait_seconds,
+            **self.rate_limit.stats(),
+        }
+
+
+def _error_headers(error: Exception) -> Mapping[str, str]:
+    response = getattr(error, "response", None)
+    return response.headers if response is not None else {}
+
+
+class LLMGateway:
+    """
+    Admission control in front of the OpenAI client. Each model has its own adaptive concurrency limit and
+    rate limit budget (OpenAI's limits are per model). Calls queue for both, are retried with jittered
+    exponential backoff on 429s, timeouts, connection errors and 5xx, and run with a per-model timeout.
+    """
+
+    def __init__(self, client: "AsyncOpenAI"):
+        self.client = client
+        self._lanes: Dict[str, _Lane] = {}
+
+    def _lane(self, model: str) -> _Lane:
+        if model not in self._lanes:
+            self._lanes[model] = _Lane(model)
+        return self._lanes[model]
+
+    def choose_model(self, model: str, allow_fallback: bool) -> str:
+        """
+        The model to call: the model's fallback when fallback is allowed and enough calls are queued for it.
+        """
+        fallback = LLM_FALLBACK_MODELS.get(model)
+        if (allow_fallback and fallback and LLM_FALLBACK_QUEUE_DEPTH > 0
+                and self._lane(model).concurrency.waiting >= LLM_FALLBACK_QUEUE_DEPTH):
+            llm_fallbacks.inc(model=model, fallback=fallback)
+            logging.info(f"{self._lane(model).concurrency.waiting} calls queued for {model}, using {fallback}")
+            return fallback
+        return model
+
+    @staticmethod
+    def _timeout(model: str) -> float:
+        return LLM_MODEL_TIMEOUTS.get(model, LLM_TIMEOUT)
+
+    @staticmethod
+    def _is_overload(error: Exception) -> bool:
+        import openai
+        return isinstance(error, (openai.RateLimitError, openai.APITimeoutError))
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a failed call, or None when it should not be retried.
+        """
+        import openai
+        if attempt >= LLM_MAX_RETRIES:
+            return None
+        if not isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+            return None
+        # Full jitter keeps retries of concurrently failed calls from arriving together
+        delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+        try:
+            retry_after = float(_error_headers(error).get("retry-after", 0))
+        except ValueError:
+            retry_after = 0.0
+        return min(LLM_RETRY_MAX_DELAY, retry_after) + delay
+
+    async def _create(self, lane: _Lane, params: dict):
+        """
+        Admit and send one call, retrying failed attempts. On return the lane slot is held by the caller.
+        :return: the parsed response (an async stream for streamed calls)
+        """
+        tokens = estimate_tokens("".join(message["content"] for message in params["messages"]))
+        tokens += params.get("max_tokens") or 0
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await lane.acquire(tokens)
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(
+                    model=lane.model, timeout=self._timeout(lane.model), **params)
+            except Exception as e:
+                lane.rate_limit.update(_error_headers(e))
+                lane.release(overloaded=self._is_overload(e))
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                llm_retries.inc(model=lane.model, error=type(e).__name__)
+                logging.warning(f"{lane.model} call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                lane.release(overloaded=False)
+                raise
+            lane.rate_limit.update(raw.headers)
+            return raw.parse()
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], phase: str, allow_fallback: bool = False,
+                       **params) -> Tuple["ChatCompletion", str]:
+        """
+        Non-streamed chat completion.
+        :return: the response and the model that generated it
+        """
+        model = self.choose_model(model, allow_fallback)
+        lane = self._lane(model)
+        start = time.perf_counter()
+        response = await self._create(lane, dict(params, messages=messages))
+        lane.release(overloaded=False)
+        elapsed = time.perf_counter() - start
+        record_openai_call(model, phase, elapsed, elapsed)
+        return response, model
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], phase: str,
+                     **params) -> AsyncGenerator[str, None]:
+        """
+        Streamed chat completion, yielding the content deltas. The call holds its concurrency slot until the
+        stream ends; only opening the stream is retried, a stream failing midway raises.
+        """
+        lane = self._lane(model)
+        start = time.perf_counter()
+        stream = await self._create(lane, dict(params, messages=messages, stream=True))
+        overloaded = False
+        first_token = None
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            overloaded = self._is_overload(e)
+            raise
+        finally:
+            lane.release(overloaded)
+        elapsed = time.perf_counter() - start
+        record_openai_call(model, phase, first_token if first_token is not None else elapsed, elapsed)
+
+    def stats(self) -> dict:
+        return {model: lane.stats() for model, lane in self._lanes.items()}
+
+
+def create_gateway() -> LLMGateway:
+    """
+    Create the OpenAI client with a tuned connection pool and wrap it in a gateway. Retries are left to the
+    gateway. Reads OPENAI_API_KEY (and OPENAI_BASE_URL) from the environment.
+    """
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    )
+    return LLMGateway(AsyncOpenAI(http_client=http_client, max_retries=0))
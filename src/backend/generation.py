@@ -0,0 +1,82 @@
+# src/backend/generation.py
+
+import asyncio
+import hashlib
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import MAP_CONCURRENCY, MAP_MAX_ROUNDS, MAP_MAX_TOKENS, MAP_MODEL, MAP_WINDOW_TOKENS
+from prompts import UseCase, MAP_PROMPT, SHARED_SYSTEM_PROMPT, SYSTEM_NOTE, SYSTEM_PROMPTS, SYSTEM_PROMPT_VERSION
+from retrieval import estimate_tokens, split_into_windows
+
+if TYPE_CHECKING:
+    from gateway import LLMGateway
+
+
+async def map_window(gateway: "LLMGateway", mode: UseCase, window: str, semaphore: asyncio.Semaphore) -> str:
+    """
+    Condense one window of the uploaded context into source-tagged notes for the given use case.
+    """
+    async with semaphore:
+        response, _ = await gateway.complete(
+            MAP_MODEL,
+            [
+                {"role": "system", "content": MAP_PROMPT.format(use_case=mode.value)},
+                {"role": "user", "content": f"Part of the user uploaded class content:\n-----\n{window}"}
+            ],
+            "map",
+            max_tokens=MAP_MAX_TOKENS
+        )
+    return response.choices[0].message.content or ""
+
+
+async def condense_context(gateway: "LLMGateway", mode: UseCase, context: str) -> Tuple[str, bool]:
+    """
+    Map phase of map-reduce generation. A context that fits in one window is returned unchanged;
+    otherwise each window is condensed concurrently (at most MAP_CONCURRENCY calls per request) and the
+    notes are concatenated, repeating for up to MAP_MAX_ROUNDS rounds until they fit.
+    The caller's usual generation call is the reduce phase.
+    :return: the context to generate from and whether it was condensed
+    """
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+    condensed = False
+    for round_num in range(MAP_MAX_ROUNDS):
+        if estimate_tokens(context) <= MAP_WINDOW_TOKENS:
+            break
+        windows = split_into_windows(context, MAP_WINDOW_TOKENS)
+        logging.info(f"Map round {round_num + 1}: condensing {len(windows)} windows for {mode.value}")
+        notes = await asyncio.gather(*(map_window(gateway, mode, window, semaphore) for window in windows))
+        context = "\n---\n".join(filter(None, notes))
+        condensed = True
+    return context, condensed
+
+
+def build_user_prompt(context: str, condensed: bool) -> str:
+    if condensed:
+        return f"Notes condensed from the user uploaded class content (source tags preserved):\n-----\n{context}"
+    return f"User uploaded class content:\n-----\n{context}"
+
+
+def build_messages(mode: UseCase, user_prompt: str) -> List[Dict[str, str]]:
+    """
+    Messages of a generation call. The shared system prompt and the uploaded context come first and the
+    mode's instructions last, so calls for different modes over the same context share a prompt prefix.
+    """
+    return [
+        {"role": "system", "content": SHARED_SYSTEM_PROMPT + SYSTEM_NOTE},
+        {"role": "user", "content": user_prompt},
+        {"role": "system", "content": SYSTEM_PROMPTS[mode]}
+    ]
+
+
+def response_cache_key(mode: UseCase, model: str, context: str) -> Optional[str]:
+    """
+    Cache key of a generated response: the use case, the models, the prompt version and the uploaded
+    context it was generated from (before any map-reduce condensing).
+    None for a blank context, whose responses must never be cached or shared: unrelated uploads would collide.
+    """
+    if not context.strip():
+        return None
+    hasher = hashlib.sha256(f"{mode.name}\0{model}\0{SYSTEM_PROMPT_VERSION}\0{MAP_MODEL}\0".encode())
+    hasher.update(context.encode("utf-8"))
+    return hasher.hexdigest()
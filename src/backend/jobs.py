@@ -0,0 +1,128 @@
+# src/backend/jobs.py
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+
+class ExtractionJob:
+    """
+    Progress of one document's background extraction. Extraction runs in two phases: the text layer
+    first (after which partial_content is available for generation), then OCR of embedded images.
+    """
+
+    def __init__(self, document_id: str, filename: str):
+        self.job_id = uuid.uuid4().hex
+        self.document_id = document_id
+        self.filename = filename
+        self.status = "queued"  # queued -> text -> ocr -> done, or failed
+        self.pages_done = 0
+        self.pages_total = 0
+        self.partial_content: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        # Incremented on every change, so progress streams only send updates
+        self.version = 0
+
+    def start_phase(self, status: str):
+        self.status = status
+        self.pages_done = 0
+        self.version += 1
+
+    def update_progress(self, pages_done: int, pages_total: int):
+        self.pages_done = pages_done
+        self.pages_total = pages_total
+        self.version += 1
+
+    def set_partial_content(self, content: str):
+        # A blank text layer (e.g. a scanned PDF) is no usable context, the document stays not ready until OCR
+        if content.strip():
+            self.partial_content = content
+        self.version += 1
+
+    def finish(self, error: Optional[str] = None):
+        self.status = "failed" if error else "done"
+        self.error = error
+        self.finished = time.time()
+        self.version += 1
+
+    @property
+    def text_ready(self) -> bool:
+        return self.partial_content is not None or self.status == "done"
+
+    @property
+    def active(self) -> bool:
+        return self.finished is None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "text_ready": self.text_ready,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs extraction jobs on a bounded thread pool and keeps them queryable for `retention` seconds
+    after they finish. Submitting a document that already has an active job returns that job.
+    """
+
+    def __init__(self, max_workers: int, retention: float):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extraction-job")
+        self._jobs: Dict[str, ExtractionJob] = {}
+        self._lock = threading.Lock()
+        self.retention = retention
+
+    def submit(self, document_id: str, filename: str,
+               run: Callable[[ExtractionJob], None]) -> Tuple[ExtractionJob, bool]:
+        """
+        Queue run(job) for a document, unless the document is already being extracted.
+        :return: the new or existing job, and whether it was newly created
+        """
+        with self._lock:
+            self._prune()
+            existing = self.find_active(document_id)
+            if existing is not None:
+                return existing, False
+            job = ExtractionJob(document_id, filename)
+            self._jobs[job.job_id] = job
+
+        def execute():
+            try:
+                run(job)
+                if job.active:
+                    job.finish()
+            except Exception as e:
+                logging.error(f"Extraction job {job.job_id} for {filename} failed: {e}")
+                job.finish(error=str(e))
+
+        self._executor.submit(execute)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[ExtractionJob]:
+        return self._jobs.get(job_id)
+
+    def find_active(self, document_id: str) -> Optional[ExtractionJob]:
+        for job in list(self._jobs.values()):
+            if job.document_id == document_id and job.active:
+                return job
+        return None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,194 @@
+# src/backend/metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Per-request stage timings (stage -> total seconds), set by the request middleware
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+# Metric updates as (metric name, value, labels), e.g. as recorded in a worker process
+MetricEvents = List[Tuple[str, float, Dict[str, str]]]
+# When set, counter increments and histogram observations are recorded here instead of applied
+recorded_metrics: ContextVar[Optional[MetricEvents]] = ContextVar("recorded_metrics", default=None)
+
+
+def _record(name: str, value: float, labels: Dict[str, str]) -> bool:
+    events = recorded_metrics.get()
+    if events is None:
+        return False
+    events.append((name, value, {key: str(label) for key, label in labels.items()}))
+    return True
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        if _record(self.name, amount, labels):
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # label key -> (per-bucket counts, with a final +Inf bucket; sum)
+        self._values: Dict[LabelKey, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if _record(self.name, value, labels):
+            return
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram("athena_stage_seconds", "Time spent in each hot-path stage.")
+cache_requests = Counter("athena_cache_requests_total", "Cache lookups by cache and result.")
+openai_first_token_seconds = Histogram("athena_openai_first_token_seconds", "Time to first token of OpenAI calls.")
+openai_seconds = Histogram("athena_openai_seconds", "Total time of OpenAI calls.")
+llm_queue_depth = Gauge("athena_llm_queue_depth", "OpenAI calls waiting for a concurrency slot, by model.")
+llm_in_flight = Gauge("athena_llm_in_flight", "OpenAI calls in flight, by model.")
+llm_concurrency_limit = Gauge("athena_llm_concurrency_limit", "Adaptive concurrency limit of OpenAI calls, by model.")
+llm_queue_wait_seconds = Histogram("athena_llm_queue_wait_seconds",
+                                   "Time OpenAI calls wait for a concurrency slot and rate limit budget.")
+llm_retries = Counter("athena_llm_retries_total", "Retried OpenAI calls by model and error.")
+llm_fallbacks = Counter("athena_llm_fallbacks_total", "OpenAI calls switched to a fallback model.")
+
+REGISTRY = [stage_seconds, cache_requests, openai_first_token_seconds, openai_seconds, llm_queue_depth, llm_in_flight,
+            llm_concurrency_limit, llm_queue_wait_seconds, llm_retries, llm_fallbacks]
+
+
+def observe_stage(stage: str, seconds: float, **labels):
+    """
+    Record a stage duration in the stage histogram and the current request's timing breakdown.
+    """
+    stage_seconds.observe(seconds, stage=stage, **labels)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[None]:
+    """
+    Time the enclosed block as a stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **labels)
+
+
+def record_openai_call(model: str, phase: str, first_token: float, total: float):
+    """
+    Record an OpenAI call's time to first token and total time (equal for non-streamed calls).
+    """
+    openai_first_token_seconds.observe(first_token, model=model, phase=phase)
+    openai_seconds.observe(total, model=model, phase=phase)
+    observe_stage("openai_first_token", first_token, phase=phase)
+    observe_stage("openai_total", total, phase=phase)
+
+
+@contextmanager
+def record_metrics() -> Iterator[MetricEvents]:
+    """
+    Record the metric updates made in the enclosed block instead of applying them, so a worker process
+    can return them to the API process (whose registry is the one scraped) for replay_metrics.
+    """
+    events: MetricEvents = []
+    token = recorded_metrics.set(events)
+    try:
+        yield events
+    finally:
+        recorded_metrics.reset(token)
+
+
+def replay_metrics(events: MetricEvents):
+    """
+    Apply metric updates recorded by record_metrics. Stage durations also count towards the current request.
+    """
+    metrics = {metric.name: metric for metric in REGISTRY}
+    for name, value, labels in events:
+        if name == stage_seconds.name:
+            labels = dict(labels)
+            observe_stage(labels.pop("stage"), value, **labels)
+        elif isinstance(metrics[name], Histogram):
+            metrics[name].observe(value, **labels)
+        else:
+            metrics[name].inc(value, **labels)
+
+
+def render_prometheus() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """
+    Format a request's timing breakdown as a Server-Timing header value (durations in milliseconds).
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
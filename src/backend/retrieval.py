@@ -0,0 +1,181 @@
+# src/backend/retrieval.py
+
+import json
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+
+# Every extracted entry starts with its source tag, e.g. "[Lecture 3.pdf Page 12]"
+PAGE_TAG_PATTERN = re.compile(r"^\[[^\]\n]+ Page \d+\]", re.MULTILINE)
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Bump when chunking or tokenization changes so persisted indexes are rebuilt
+INDEX_VERSION = "1"
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were "
+    "will with which".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (roughly four characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_into_chunks(context: str, chunk_tokens: int) -> List[str]:
+    """
+    Split an extracted document into page-tagged chunks. Entries longer than chunk_tokens are split on
+    line boundaries and each piece is re-prefixed with its page tag, so every chunk carries its source.
+    """
+    starts = [match.start() for match in PAGE_TAG_PATTERN.finditer(context)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    entries = [context[start:end].strip("\n") for start, end in zip(starts, starts[1:] + [len(context)])]
+
+    max_chars = chunk_tokens * 4
+    chunks = []
+    for entry in filter(None, entries):
+        if len(entry) <= max_chars:
+            chunks.append(entry)
+            continue
+
+        tag_match = PAGE_TAG_PATTERN.match(entry)
+        tag = tag_match.group(0) if tag_match else ""
+        piece = ""
+        for line in entry.splitlines(keepends=True):
+            if piece and len(piece) + len(line) > max_chars:
+                chunks.append(piece.rstrip("\n"))
+                piece = f"{tag}\n" if tag else ""
+            piece += line
+        if piece.strip():
+            chunks.append(piece.rstrip("\n"))
+    return chunks
+
+
+def split_into_windows(context: str, window_tokens: int) -> List[str]:
+    """
+    Pack a context's page-tagged chunks into consecutive windows of at most window_tokens each.
+    """
+    windows = []
+    window, used_tokens = [], 0
+    for chunk in split_into_chunks(context, window_tokens):
+        chunk_tokens = estimate_tokens(chunk)
+        if window and used_tokens + chunk_tokens > window_tokens:
+            windows.append("\n".join(window))
+            window, used_tokens = [], 0
+        window.append(chunk)
+        used_tokens += chunk_tokens
+    if window:
+        windows.append("\n".join(window))
+    return windows
+
+
+class DocumentIndex:
+    """
+    Per-document lexical index: the document's page-tagged chunks with their term frequencies.
+    Indexes of several documents are combined at query time, so BM25 statistics cover the whole upload set.
+    """
+
+    def __init__(self, chunks: List[str], term_frequencies: List[Dict[str, int]]):
+        self.chunks = chunks
+        self.term_frequencies = term_frequencies
+        self.lengths = [sum(tf.values()) for tf in term_frequencies]
+        self.token_counts = [estimate_tokens(chunk) for chunk in chunks]
+
+    @classmethod
+    def build(cls, context: str, chunk_tokens: int) -> "DocumentIndex":
+        chunks = split_into_chunks(context, chunk_tokens)
+        return cls(chunks, [dict(Counter(tokenize(chunk))) for chunk in chunks])
+
+    def to_json(self) -> bytes:
+        return json.dumps({"version": INDEX_VERSION, "chunks": self.chunks, "tf": self.term_frequencies}).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "DocumentIndex":
+        payload = json.loads(data)
+        if payload.get("version") != INDEX_VERSION:
+            raise ValueError(f"Index version {payload.get('version')} is not {INDEX_VERSION}")
+        return cls(payload["chunks"], payload["tf"])
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.token_counts)
+
+    def text(self) -> str:
+        return "\n".join(self.chunks)
+
+
+def bm25_scores(indexes: List[DocumentIndex], query: str) -> List[List[float]]:
+    """
+    Score every chunk of every document against the query with Okapi BM25.
+    """
+    query_terms = set(tokenize(query))
+    chunk_count = sum(len(index.chunks) for index in indexes)
+    if not query_terms or not chunk_count:
+        return [[0.0] * len(index.chunks) for index in indexes]
+
+    average_length = sum(sum(index.lengths) for index in indexes) / chunk_count or 1.0
+    document_frequency = Counter()
+    for index in indexes:
+        for tf in index.term_frequencies:
+            document_frequency.update(term for term in query_terms if term in tf)
+    idf = {term: math.log(1 + (chunk_count - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    scores = []
+    for index in indexes:
+        document_scores = []
+        for tf, length in zip(index.term_frequencies, index.lengths):
+            score = 0.0
+            for term, weight in idf.items():
+                frequency = tf.get(term, 0)
+                if frequency:
+                    score += weight * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+            document_scores.append(score)
+        scores.append(document_scores)
+    return scores
+
+
+def select_context(indexes: List[DocumentIndex], query: str, token_budget: int) -> str:
+    """
+    Build the prompt context for a query within a token budget.
+    If every document fits, the full context is returned unchanged, so no page of an upload that fits is lost.
+    Otherwise the best chunks by BM25 score are kept until the budget is full, in their original document
+    and page order so the source tags still read naturally.
+    """
+    if sum(index.total_tokens for index in indexes) <= token_budget:
+        return "\n---\n".join(index.text() for index in indexes)
+
+    scores = bm25_scores(indexes, query)
+    ranked = sorted(
+        ((score, doc_num, chunk_num) for doc_num, document_scores in enumerate(scores)
+         for chunk_num, score in enumerate(document_scores)),
+        key=lambda item: (-item[0], item[1], item[2]),
+    )
+
+    selected = set()
+    used_tokens = 0
+    for _, doc_num, chunk_num in ranked:
+        chunk_tokens = indexes[doc_num].token_counts[chunk_num]
+        if used_tokens + chunk_tokens > token_budget:
+            continue
+        selected.add((doc_num, chunk_num))
+        used_tokens += chunk_tokens
+
+    contexts = []
+    for doc_num, index in enumerate(indexes):
+        chunks = [chunk for chunk_num, chunk in enumerate(index.chunks) if (doc_num, chunk_num) in selected]
+        if chunks:
+            contexts.append("\n".join(chunks))
+    return "\n---\n".join(contexts)
@@ -0,0 +1,100 @@
+# src/backend/singleflight.py
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical jobs: the first caller for a key starts the job, and every caller
+    that arrives while it is in flight awaits the same result instead of running its own.
+    The job runs as its own task, so a caller disconnecting doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, job: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(job())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
+
+
+class _Broadcast:
+    """
+    Buffers the items of one async iterator so any number of subscribers can replay them from the start
+    while it is still producing.
+    """
+
+    def __init__(self):
+        self.items: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def run(self, source: AsyncIterator[str]):
+        try:
+            async for item in source:
+                self.items.append(item)
+                async with self._changed:
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._changed:
+                if position == len(self.items) and not self.done:
+                    await self._changed.wait()
+
+
+class StreamFlight:
+    """
+    Streaming counterpart of SingleFlight: concurrent requests for the same key share one producer,
+    and each subscriber receives every item from the beginning as it is produced.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Broadcast] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def subscribe(self, key: str, producer: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        broadcast = self._inflight.get(key)
+        if broadcast is not None:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            broadcast = _Broadcast()
+            self._inflight[key] = broadcast
+            task = asyncio.ensure_future(broadcast.run(producer()))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return broadcast.subscribe()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
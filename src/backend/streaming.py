@@ -0,0 +1,136 @@
+# src/backend/streaming.py
+
+import re
+import time
+from typing import Optional
+
+# LaTeX in square brackets [ ... ] is converted to display math $$ ... $$
+BRACKET_MATH_PATTERN = re.compile(r"\[([^\[\]]+)\]")
+# Display math $$ ... $$ gets spaces inside the delimiters
+DISPLAY_MATH_PATTERN = re.compile(r"\$\$([^\$]+)\$\$")
+
+# Text held back waiting for a closing delimiter is released anyway beyond this size,
+# so a stray "[" or "$" can't stall the stream until the end
+MAX_PENDING_CHARS = 4000
+
+
+def sanitize_latex_content(content: str) -> str:
+    """
+    Detect and format LaTeX expressions enclosed in square brackets [ ... ] or $$ ... $$.
+    Ensures consistency for rendering.
+    """
+    # Convert LaTeX in square brackets [ ... ] to display math $$ ... $$
+    content = BRACKET_MATH_PATTERN.sub(r"$$\1$$", content)
+
+    # Ensure proper spacing around LaTeX for readability
+    content = DISPLAY_MATH_PATTERN.sub(r"$$ \1 $$", content)
+    return content
+
+
+def _open_bracket_start(text: str) -> int:
+    """
+    Index from which text may still become part of a [ ... ] match once more text arrives: the last
+    bracket if it is an opening one (nothing can match across a bracket), otherwise the end of the text.
+    """
+    last_bracket = max(text.rfind("["), text.rfind("]"))
+    if last_bracket >= 0 and text[last_bracket] == "[":
+        return last_bracket
+    return len(text)
+
+
+def _open_math_start(text: str) -> int:
+    """
+    Index from which text may still become part of a $$ ... $$ match once more text arrives, after the
+    last complete match: an unclosed "$$" (possibly followed by the first "$" of its closing pair) or a
+    "$" ending the text. Otherwise the end of the text, so inline $ ... $ math is released right away.
+    """
+    settled = 0
+    for match in DISPLAY_MATH_PATTERN.finditer(text):
+        settled = match.end()
+
+    # An open "$$" has at most one "$" after it, so only the last three dollars can start one
+    dollars = []
+    index = len(text)
+    while len(dollars) < 3:
+        index = text.rfind("$", settled, index)
+        if index < 0:
+            break
+        dollars.insert(0, index)
+
+    for start in dollars:
+        if start == len(text) - 1:
+            return start
+        content = text[start + 2:]
+        if text[start + 1] == "$" and ("$" not in content or
+                                       (content.index("$") == len(content) - 1 and len(content) > 1)):
+            return start
+    return len(text)
+
+
+class LatexStreamSanitizer:
+    """
+    Incremental sanitize_latex_content for streamed deltas. Text that could still be part of a
+    delimiter pair split across deltas is held back until it is resolved, so the concatenated output
+    equals sanitize_latex_content applied to the whole response (up to MAX_PENDING_CHARS of lookahead).
+    """
+
+    def __init__(self):
+        self._bracket_pending = ""
+        self._math_pending = ""
+
+    def feed(self, delta: str) -> str:
+        """
+        Add a delta and return the text that is now final.
+        """
+        self._bracket_pending += delta
+        cut = _open_bracket_start(self._bracket_pending)
+        if len(self._bracket_pending) - cut > MAX_PENDING_CHARS:
+            cut = len(self._bracket_pending)
+        settled, self._bracket_pending = self._bracket_pending[:cut], self._bracket_pending[cut:]
+
+        self._math_pending += BRACKET_MATH_PATTERN.sub(r"$$\1$$", settled)
+        cut = _open_math_start(self._math_pending)
+        if len(self._math_pending) - cut > MAX_PENDING_CHARS:
+            cut = len(self._math_pending)
+        settled, self._math_pending = self._math_pending[:cut], self._math_pending[cut:]
+        return DISPLAY_MATH_PATTERN.sub(r"$$ \1 $$", settled)
+
+    def flush(self) -> str:
+        """
+        Return everything still held back, at the end of the stream.
+        """
+        remaining = self._math_pending + BRACKET_MATH_PATTERN.sub(r"$$\1$$", self._bracket_pending)
+        self._bracket_pending = self._math_pending = ""
+        return DISPLAY_MATH_PATTERN.sub(r"$$ \1 $$", remaining)
+
+
+class ChunkCoalescer:
+    """
+    Merges small deltas into larger flushes, emitted once max_chars have accumulated or max_interval
+    seconds have passed since the last flush.
+    """
+
+    def __init__(self, max_chars: int, max_interval: float):
+        self.max_chars = max_chars
+        self.max_interval = max_interval
+        self._buffer = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, text: str) -> Optional[str]:
+        """
+        Buffer text and return a flush if one is due.
+        """
+        if text:
+            self._buffer.append(text)
+            self._size += len(text)
+        if self._size >= self.max_chars or time.monotonic() - self._last_flush >= self.max_interval:
+            return self.flush() or None
+        return None
+
+    def flush(self) -> str:
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        return text
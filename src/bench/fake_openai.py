@@ -0,0 +1,90 @@
+# src/bench/fake_openai.py
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+# Latency before the first token and generation speed, configurable so runs can model different providers
+FIRST_TOKEN_LATENCY = float(os.getenv("FAKE_OPENAI_FIRST_TOKEN_LATENCY", 0.5))
+TOKENS_PER_SECOND = float(os.getenv("FAKE_OPENAI_TOKENS_PER_SECOND", 80))
+OUTPUT_TOKENS = int(os.getenv("FAKE_OPENAI_OUTPUT_TOKENS", 400))
+
+SAMPLE_TOKENS = ("## Key concepts\n\n", "- **Entropy** ", "measures ", "uncertainty ", "(source: ", "[Deck] ",
+                 "Page 1). ", "The formula ", "is ", "[H = -\\sum p \\log p]", ".\n\n", "Example: ", "a fair ",
+                 "coin ", "has ", "$$H = 1$$", " bit.\n\n")
+
+app = FastAPI()
+
+
+def output_tokens(max_tokens: int):
+    for index in range(min(max_tokens or OUTPUT_TOKENS, OUTPUT_TOKENS)):
+        yield SAMPLE_TOKENS[index % len(SAMPLE_TOKENS)]
+
+
+def rate_limit_headers() -> dict:
+    return {
+        "x-ratelimit-limit-requests": "10000",
+        "x-ratelimit-remaining-requests": "9999",
+        "x-ratelimit-reset-requests": "6ms",
+        "x-ratelimit-limit-tokens": "10000000",
+        "x-ratelimit-remaining-tokens": "9990000",
+        "x-ratelimit-reset-tokens": "6ms",
+    }
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "fake-model", "object": "model", "created": 0, "owned_by": "bench"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake-model")
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        tokens = list(output_tokens(max_tokens))
+        await asyncio.sleep(FIRST_TOKEN_LATENCY + len(tokens) / TOKENS_PER_SECOND)
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(tokens)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                      "total_tokens": prompt_tokens + len(tokens)},
+        }, headers=rate_limit_headers())
+
+    async def stream():
+        await asyncio.sleep(FIRST_TOKEN_LATENCY)
+        for token in output_tokens(max_tokens):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(1 / TOKENS_PER_SECOND)
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=rate_limit_headers())
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API.")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
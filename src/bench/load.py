@@ -0,0 +1,243 @@
+# src/bench/load.py
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from synthetic_pdfs import generate_corpus
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), "backend")
+
+MODE = "STUDY_GUIDE"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_servers(cache_dir: str, env_overrides: Dict[str, str]):
+    """
+    Start the fake OpenAI server and the backend pointed at it, both on free local ports.
+    :return: the two processes and the backend URL
+    """
+    fake_port, backend_port = free_port(), free_port()
+    env = dict(os.environ, **env_overrides)
+    fake = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_openai.py"), "--port", str(fake_port)],
+                            env=env)
+    wait_until_up(f"http://127.0.0.1:{fake_port}/v1/models")
+
+    env.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_API_KEY": "bench",
+        "ATHENA_CACHE_DIR": cache_dir,
+    })
+    backend = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+                                "--port", str(backend_port), "--log-level", "warning"], env=env, cwd=cache_dir)
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    wait_until_up(f"{backend_url}/use_cases")
+    return fake, backend, backend_url
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """
+    Peak resident set size of a process and its children (e.g. the extraction pool), in MB.
+    Uses psutil when installed, otherwise /proc for the process itself.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    pids = [pid]
+    if psutil is not None:
+        try:
+            pids += [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            pass
+
+    total_kb = 0
+    for process_id in pids:
+        try:
+            with open(f"/proc/{process_id}/status") as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+        except (OSError, StopIteration):
+            continue
+    return total_kb / 1024 if total_kb else None
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(name: str, latencies: List[float], elapsed: float, errors: int,
+              first_token: Optional[List[float]] = None) -> dict:
+    result = {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+    }
+    if first_token is not None:
+        result["ttft_p50_s"] = percentile(first_token, 0.50)
+        result["ttft_p95_s"] = percentile(first_token, 0.95)
+    return result
+
+
+def upload_payload(path: str) -> list:
+    with open(path, "rb") as f:
+        return [("files", (os.path.basename(path), f.read(), "application/pdf"))]
+
+
+async def run_scenario(name: str, backend_url: str, paths: List[str], users: int) -> dict:
+    """
+    Send one request per PDF to an endpoint with `users` concurrent clients.
+    """
+    latencies, first_token = [], []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    async def user(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            files = upload_payload(path)
+            start = time.perf_counter()
+            try:
+                if name == "process_stream":
+                    async with client.stream("POST", f"{backend_url}/process_stream", data={"mode": MODE},
+                                             files=files) as response:
+                        response.raise_for_status()
+                        first = None
+                        async for line in response.aiter_lines():
+                            if line and first is None:
+                                first = time.perf_counter() - start
+                        first_token.append(first if first is not None else time.perf_counter() - start)
+                elif name == "process":
+                    response = await client.post(f"{backend_url}/process", data={"mode": MODE}, files=files)
+                    response.raise_for_status()
+                else:
+                    response = await client.post(f"{backend_url}/process_files", files=files)
+                    response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                print(f"{name} request for {path} failed: {e}", file=sys.stderr)
+                errors += 1
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=httpx.Timeout(600)) as client:
+        await asyncio.gather(*(user(client) for _ in range(users)))
+    elapsed = time.perf_counter() - start
+
+    return summarize(name, latencies, elapsed, errors, first_token if name == "process_stream" else None)
+
+
+def bench_extraction(paths: List[str]) -> List[dict]:
+    """
+    Extraction throughput in pages per second, cold (empty caches) and warm (page cache populated).
+    Runs in-process against a fresh cache directory.
+    """
+    os.environ["ATHENA_CACHE_DIR"] = tempfile.mkdtemp(prefix="athena-bench-extraction-")
+    sys.path.insert(0, BACKEND_DIR)
+    import pymupdf
+    from extraction import extract_markdown_from_pdf, shutdown_extraction_executor
+
+    pages = 0
+    for path in paths:
+        with pymupdf.open(path) as doc:
+            pages += len(doc)
+
+    results = []
+    try:
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            for path in paths:
+                extract_markdown_from_pdf(path, os.path.basename(path))
+            elapsed = time.perf_counter() - start
+            results.append({"scenario": f"extraction_{label}", "pages": pages,
+                            "pages_per_s": pages / elapsed if elapsed else 0.0, "elapsed_s": elapsed})
+    finally:
+        shutdown_extraction_executor()
+    return results
+
+
+def print_report(results: List[dict]):
+    for result in results:
+        fields = ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in result.items() if key != "scenario" and value is not None)
+        print(f"{result['scenario']:<20} {fields}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load benchmark of the Athena backend.")
+    parser.add_argument("--users", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--documents", type=int, default=16, help="distinct PDFs, one request each per scenario")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--images-per-page", type=int, default=1)
+    parser.add_argument("--first-token-latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--scenarios", default="process_files,process_stream,process")
+    parser.add_argument("--skip-extraction", action="store_true")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    corpus_dir = os.path.join(tempfile.gettempdir(), "athena-bench-corpus")
+    paths = generate_corpus(corpus_dir, args.documents, args.pages, images_per_page=args.images_per_page)
+    cache_dir = tempfile.mkdtemp(prefix="athena-bench-cache-")
+
+    fake, backend, backend_url = start_servers(cache_dir, {
+        "FAKE_OPENAI_FIRST_TOKEN_LATENCY": str(args.first_token_latency),
+        "FAKE_OPENAI_TOKENS_PER_SECOND": str(args.tokens_per_second),
+    })
+    results = []
+    try:
+        for name in args.scenarios.split(","):
+            results.append(asyncio.run(run_scenario(name, backend_url, paths, args.users)))
+        results.append({"scenario": "backend_memory", "peak_rss_mb": peak_rss_mb(backend.pid)})
+    finally:
+        for process in (backend, fake):
+            process.terminate()
+            process.wait(timeout=30)
+
+    if not args.skip_extraction:
+        results += bench_extraction(paths)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# src/bench/startup.py
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from load import BACKEND_DIR, free_port, percentile, print_report, wait_until_up
+
+HEAVY_MODULES = ["pymupdf", "pytesseract", "PIL", "openai"]
+
+# Runs in a fresh interpreter: time `import main` and report which heavy modules it loaded
+IMPORT_PROBE = """
+import json, sys, time
+eager = sys.argv[1:]
+start = time.perf_counter()
+for name in eager:
+    __import__(name)
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+""" % HEAVY_MODULES
+
+
+def bench_env(cache_dir: str, overrides: Dict[str, str]) -> Dict[str, str]:
+    return dict(os.environ, OPENAI_API_KEY="bench", ATHENA_CACHE_DIR=cache_dir, **overrides)
+
+
+def bench_import(name: str, runs: int, cache_dir: str, eager: List[str]) -> dict:
+    """
+    Time importing the backend app in fresh interpreters. `eager` modules are imported first, to
+    reproduce an app that loads them at import time.
+    """
+    timings, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_PROBE, *eager], cwd=BACKEND_DIR, check=True,
+                                capture_output=True, text=True, env=bench_env(cache_dir, {})).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"scenario": name, "runs": runs, "p50_s": percentile(timings, 0.50), "max_s": max(timings),
+            "heavy_modules": ",".join(loaded) or "none"}
+
+
+def bench_ready(name: str, runs: int, cache_dir: str, overrides: Dict[str, str]) -> dict:
+    """
+    Time from launching uvicorn to the first successful /use_cases response.
+    """
+    timings = []
+    for _ in range(runs):
+        port = free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+                                   "--port", str(port), "--log-level", "warning"],
+                                  env=bench_env(cache_dir, overrides), cwd=cache_dir)
+        try:
+            wait_until_up(f"http://127.0.0.1:{port}/use_cases")
+            timings.append(time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {"scenario": name, "runs": runs, "p50_s": percentile(timings, 0.50), "max_s": max(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark of the Athena backend.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per scenario")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="athena-bench-startup-")
+    results = [
+        bench_import("import_lazy", args.runs, cache_dir, []),
+        # What importing the app cost when it loaded the PDF, OCR and OpenAI stacks up front
+        bench_import("import_eager", args.runs, cache_dir, HEAVY_MODULES),
+        bench_ready("ready", args.runs, cache_dir, {}),
+        bench_ready("ready_warmup", args.runs, cache_dir, {"ATHENA_WARMUP": "1"}),
+    ]
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
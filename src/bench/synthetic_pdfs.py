@@ -0,0 +1,90 @@
+# src/bench/synthetic_pdfs.py
+
+import argparse
+import os
+import random
+from typing import List
+
+import pymupdf
+
+WORDS = ("lecture theorem proof definition example integral derivative matrix vector entropy algorithm "
+         "complexity hypothesis experiment variable function limit series probability distribution "
+         "equation model system energy force momentum network protocol memory cache process thread").split()
+
+PAGE_RECT = pymupdf.paper_rect("letter")
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 16))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def render_text_image(text: str, width: int, height: int) -> bytes:
+    """
+    PNG of some text, so OCR has something to read.
+    """
+    with pymupdf.open() as doc:
+        page = doc.new_page(width=width, height=height)
+        page.insert_textbox(pymupdf.Rect(4, 4, width - 4, height - 4), text, fontsize=14)
+        return page.get_pixmap(dpi=144).tobytes("png")
+
+
+def generate_pdf(path: str, pages: int, words_per_page: int = 150, images_per_page: int = 1,
+                 shared_logo: bool = True, seed: int = 0):
+    """
+    Write a synthetic lecture deck: each page has a title, body text and images_per_page images with
+    text in them. With shared_logo, every page also repeats the same logo image, like real slide decks.
+    """
+    rng = random.Random(seed)
+    logo = render_text_image("ATHENA UNIVERSITY", 240, 48) if shared_logo else None
+
+    with pymupdf.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+            page.insert_text((54, 72), f"Slide {page_num + 1}: {rng.choice(WORDS).title()}", fontsize=20)
+            page.insert_textbox(pymupdf.Rect(54, 96, PAGE_RECT.width - 54, 460), random_text(rng, words_per_page),
+                                fontsize=11)
+
+            for img_index in range(images_per_page):
+                image = render_text_image(random_text(rng, 12), 280, 90)
+                top = 480 + img_index * 100
+                page.insert_image(pymupdf.Rect(54, top, 334, top + 90), stream=image)
+
+            if logo is not None:
+                page.insert_image(pymupdf.Rect(PAGE_RECT.width - 174, PAGE_RECT.height - 60,
+                                               PAGE_RECT.width - 54, PAGE_RECT.height - 36), stream=logo)
+        doc.save(path, garbage=3, deflate=True)
+
+
+def generate_corpus(directory: str, count: int, pages: int, words_per_page: int = 150, images_per_page: int = 1,
+                    shared_logo: bool = True) -> List[str]:
+    """
+    Write `count` distinct decks (different seeds) to directory and return their paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for seed in range(count):
+        path = os.path.join(directory, f"deck_{pages}p_{seed}.pdf")
+        if not os.path.exists(path):
+            generate_pdf(path, pages, words_per_page, images_per_page, shared_logo, seed)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic lecture PDFs for benchmarking.")
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--words-per-page", type=int, default=150)
+    parser.add_argument("--images-per-page", type=int, default=1)
+    parser.add_argument("--no-shared-logo", action="store_true")
+    args = parser.parse_args()
+
+    for path in generate_corpus(args.directory, args.count, args.pages, args.words_per_page, args.images_per_page,
+                                not args.no_shared_logo):
+        print(path)
@@ -2,10 +2,18 @@
 
 import json
 import logging
+import time
 
 import requests
 import streamlit as st
 
+from rendering import IncrementalMarkdownRenderer
+
+BACKEND_URL = "http://localhost:8000"
+
+# Maximum repaints per second of the block still being streamed
+RENDER_FPS = 10
+
 st.title("Athena")
 
 # Configure logging
@@ -19,19 +27,137 @@ uploaded_files = st.file_uploader("Upload your lecture slides (PDF)",
 
 # Get use cases from backend
 try:
-    use_cases = requests.get("http://localhost:8000/use_cases").json()
+    use_cases = requests.get(f"{BACKEND_URL}/use_cases").json()
 except requests.exceptions.RequestException:
     st.error("Failed to fetch use cases from the backend.")
     use_cases = []
 
 mode = st.selectbox("What do you want Athena to generate?", use_cases, format_func=lambda x: x["name"])
 
+# Document IDs the backend returned for each uploaded file, so their bytes are only ever sent once
+if 'document_ids' not in st.session_state:
+    st.session_state.document_ids = {}
+# Extraction job of each uploaded file, to wait on if the backend reports it still processing
+if 'job_ids' not in st.session_state:
+    st.session_state.job_ids = {}
+
+
+# Seconds between polls of background extraction progress
+JOB_POLL_INTERVAL = 0.5
+# Seconds to wait for the text layers of uploaded documents before giving up
+JOB_TIMEOUT = 600
+
+
+def show_error(response):
+    """
+    Show a failed backend response with the reason the backend gave.
+    """
+    try:
+        detail = response.json().get("detail", "")
+    except ValueError:
+        detail = response.text
+    st.error(f"Error {response.status_code}: {detail}")
+
+
+def wait_for_text(jobs):
+    """
+    Show extraction progress until every job's text layer is ready. OCR of images may still be running
+    in the background, but generation can already start.
+    :return: the IDs of jobs the backend no longer knows (e.g. after a restart), whose files must be uploaded again
+    """
+    progress_bar = st.progress(0.0, text="Extracting text")
+    deadline = time.monotonic() + JOB_TIMEOUT
+    lost_job_ids = []
+    while jobs:
+        if time.monotonic() > deadline:
+            st.error("Timed out waiting for the documents to be processed.")
+            break
+        polled = []
+        for job in jobs:
+            response = requests.get(f"{BACKEND_URL}/jobs/{job['job_id']}")
+            if response.status_code == 404:
+                lost_job_ids.append(job["job_id"])
+            else:
+                response.raise_for_status()
+                polled.append(response.json())
+        jobs = polled
+        pages_done = sum(job["pages_done"] for job in jobs)
+        pages_total = sum(job["pages_total"] for job in jobs)
+        if pages_total:
+            progress_bar.progress(pages_done / pages_total, text=f"Extracting text ({pages_done}/{pages_total} pages)")
+        for job in jobs:
+            if job["status"] == "failed":
+                st.error(f"Failed to process {job['filename']}: {job['error']}")
+        jobs = [job for job in jobs if not job["text_ready"] and job["status"] != "failed"]
+        if jobs:
+            time.sleep(JOB_POLL_INTERVAL)
+    progress_bar.empty()
+    return lost_job_ids
+
+
+def wait_for_files(files, jobs, retry=True):
+    """
+    Wait for the text of the files extracted by the given jobs, uploading again (once) any file whose
+    job the backend lost.
+    """
+    lost_job_ids = wait_for_text(jobs)
+    lost_files = [f for f, job in zip(files, jobs) if job["job_id"] in lost_job_ids]
+    if lost_files and retry:
+        upload_documents(lost_files, retry=False)
+    elif lost_files:
+        st.error(f"The backend lost track of {', '.join(f.name for f in lost_files)}.")
+
+
+def upload_documents(files, retry=True):
+    """
+    Upload files to the backend for background extraction and remember the document IDs it returns.
+    """
+    payload = [("files", (f.name, f.getvalue(), "application/pdf")) for f in files]
+    response = requests.post(f"{BACKEND_URL}/jobs", files=payload)
+    if response.status_code != 200:
+        show_error(response)
+        return
+    jobs = response.json()["jobs"]
+    for f, job in zip(files, jobs):
+        st.session_state.document_ids[f.file_id] = job["document_id"]
+        st.session_state.job_ids[f.file_id] = job["job_id"]
+    wait_for_files(files, jobs, retry)
+
+
+def request_generation(endpoint, mode_id, files, stream):
+    """
+    Ask the backend to generate from already uploaded documents. If the backend no longer has one of
+    them (e.g. its cache evicted it), the files are uploaded again and the request is retried once.
+    If one is still being processed, its extraction is waited for first.
+    """
+    missing_files = [f for f in files if f.file_id not in st.session_state.document_ids]
+    if missing_files:
+        upload_documents(missing_files)
+
+    def post():
+        data = {"mode": mode_id,
+                "document_ids": [st.session_state.document_ids[f.file_id] for f in files
+                                 if f.file_id in st.session_state.document_ids]}
+        return requests.post(f"{BACKEND_URL}/{endpoint}", data=data, stream=stream)
+
+    response = post()
+    if response.status_code == 404:
+        response.close()
+        upload_documents(files)
+        response = post()
+    elif response.status_code == 409:
+        response.close()
+        waiting = [f for f in files if f.file_id in st.session_state.job_ids]
+        wait_for_files(waiting, [{"job_id": st.session_state.job_ids[f.file_id]} for f in waiting])
+        response = post()
+    return response
+
+
 if uploaded_files:
-    files = [("files", (f.name, f.getvalue(), "application/pdf")) for f in uploaded_files]
-    with st.spinner("Processing"):
-        response = requests.post("http://localhost:8000/process_files", files=files)
-        if response.status_code != 200:
-            st.error(f"Error: {response.status_code}")
+    new_files = [f for f in uploaded_files if f.file_id not in st.session_state.document_ids]
+    if new_files:
+        with st.spinner("Processing"):
+            upload_documents(new_files)
 
 generate_button = st.button("Generate", type="primary")
 
@@ -43,10 +169,6 @@ download_container = st.container()
 
 if generate_button:
     if uploaded_files:
-        data = {"mode": mode["id"]}
-        # Convert the uploaded files into a format suitable for requests
-        file_data = [("files", (f.name, f.getvalue(), "application/pdf")) for f in uploaded_files]
-
         stream_mode = True
         with st.spinner("Processing your request..."):
             try:
@@ -54,37 +176,23 @@ if generate_button:
                 full_response = ""
 
                 if stream_mode:
-                    with requests.post(
-                            "http://localhost:8000/process_stream",
-                            data=data,
-                            files=file_data,
-                            stream=True
-                    ) as response:
+                    with request_generation("process_stream", mode["id"], uploaded_files, stream=True) as response:
                         if response.status_code == 200:
+                            # Finished blocks are rendered once; only the open block is repainted
+                            renderer = IncrementalMarkdownRenderer(message_placeholder.container(), RENDER_FPS)
+                            response_parts = []
                             for line in response.iter_lines():
                                 if line:
                                     try:
                                         chunk = json.loads(line)
-                                        full_response += chunk["content"]
-
-                                        # Process the full response for Markdown rendering
-                                        split_content = full_response.split('$$')  # Assuming LaTeX is enclosed in $$
-                                        formatted_parts = []
-                                        for i, part in enumerate(split_content):
-                                            if i % 2 == 0:
-                                                # Ensure proper Markdown formatting
-                                                formatted_parts.append(part.strip())
-                                            else:
-                                                # Process LaTeX parts
-                                                formatted_parts.append(f"$$ {part.strip()} $$")
-
-                                        # Join all parts and add newlines for proper formatting
-                                        formatted_response = "\n\n".join(formatted_parts)
-                                        message_placeholder.markdown(formatted_response, unsafe_allow_html=True)
+                                        response_parts.append(chunk["content"])
+                                        renderer.write(chunk["content"])
 
                                     except json.JSONDecodeError:
                                         continue
 
+                            renderer.close()
+                            full_response = "".join(response_parts)
                             st.session_state.generated_output = full_response
                             with download_container:
                                 st.download_button(
@@ -95,11 +203,11 @@ if generate_button:
                                     key=f"download_button_{hash(full_response)}"
                                 )
                         else:
-                            st.error(f"Error: {response.status_code}")
+                            show_error(response)
 
                 else:
                     # Non-streaming mode
-                    response = requests.post("http://localhost:8000/process", data=data, files=file_data)
+                    response = request_generation("process", mode["id"], uploaded_files, stream=False)
                     if response.status_code == 200:
                         response_json = response.json()
                         full_response = response_json["output"]
@@ -120,7 +228,7 @@ if generate_button:
                                 mime="text/markdown"
                             )
                     else:
-                        st.error(f"Error: {response.status_code}")
+                        show_error(response)
             except requests.exceptions.RequestException as e:
                 st.error(f"Request failed: {str(e)}")
     else:
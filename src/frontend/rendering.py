@@ -0,0 +1,101 @@
+# src/frontend/rendering.py
+
+import time
+
+MATH_DELIMITER = "$$"
+CODE_FENCE = "```"
+
+
+def _paragraph_end(text: str) -> int:
+    """
+    Index of the blank line ending the first paragraph of text, ignoring blank lines inside code fences,
+    or -1 if the paragraph is still open.
+    """
+    search_from = 0
+    while True:
+        end = text.find("\n\n", search_from)
+        if end < 0:
+            return -1
+        if text.count(CODE_FENCE, 0, end) % 2 == 0:
+            return end
+        search_from = end + 2
+
+
+def format_block(block: str) -> str:
+    """
+    Markdown for one block: display math is normalised to "$$ ... $$", other text is stripped.
+    """
+    block = block.strip()
+    if block.startswith(MATH_DELIMITER):
+        inner = block[len(MATH_DELIMITER):]
+        if inner.endswith(MATH_DELIMITER):
+            inner = inner[:-len(MATH_DELIMITER)]
+        return f"$$ {inner.strip()} $$"
+    return block
+
+
+class IncrementalMarkdownRenderer:
+    """
+    Renders streamed markdown in O(n) overall: finished blocks (paragraphs and closed $$ math) are
+    rendered once into their own placeholder, and only the open tail block is re-rendered, at most
+    `fps` times per second.
+    """
+
+    def __init__(self, container, fps: float):
+        self.container = container
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self._tail = ""
+        self._tail_placeholder = container.empty()
+        self._last_render = 0.0
+
+    def _next_block_end(self) -> int:
+        """
+        Length of the finished block at the start of the tail (including its separator), or -1 if none.
+        """
+        text = self._tail
+        stripped = len(text) - len(text.lstrip("\n"))
+        if text.startswith(MATH_DELIMITER, stripped):
+            close = text.find(MATH_DELIMITER, stripped + len(MATH_DELIMITER))
+            return close + len(MATH_DELIMITER) if close >= 0 else -1
+
+        # Math starts a new block, as does a blank line
+        math_start = text.find(MATH_DELIMITER, stripped)
+        paragraph_end = _paragraph_end(text[:math_start] if math_start >= 0 else text)
+        if paragraph_end >= 0:
+            return paragraph_end + 2
+        if math_start >= 0 and text.count(CODE_FENCE, 0, math_start) % 2 == 0:
+            return math_start
+        return -1
+
+    def _commit(self, block: str):
+        block = format_block(block)
+        if not block:
+            return
+        self._tail_placeholder.markdown(block, unsafe_allow_html=True)
+        self._tail_placeholder = self.container.empty()
+
+    def write(self, text: str):
+        """
+        Append streamed text, committing any blocks it completes and repainting the tail if due.
+        """
+        self._tail += text
+        committed = False
+        while True:
+            end = self._next_block_end()
+            if end <= 0:
+                break
+            self._commit(self._tail[:end])
+            self._tail = self._tail[end:]
+            committed = True
+
+        now = time.monotonic()
+        if committed or now - self._last_render >= self.min_interval:
+            self._tail_placeholder.markdown(format_block(self._tail), unsafe_allow_html=True)
+            self._last_render = now
+
+    def close(self):
+        """
+        Render whatever is left once the stream ends.
+        """
+        self._commit(self._tail)
+        self._tail = ""
@@ -0,0 +1,9 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Backend modules import each other as top-level modules, as when uvicorn runs with --app-dir src/backend,
+# and so do the frontend's, as when streamlit runs src/frontend/app.py
+sys.path.insert(0, os.path.join(SRC_DIR, "backend"))
+sys.path.insert(0, os.path.join(SRC_DIR, "frontend"))
@@ -0,0 +1,90 @@
+import os
+import time
+
+from cache import DiskCache, MemoryLRU, TieredCache
+
+
+def test_memory_lru_stays_within_its_byte_bound_and_evicts_the_least_recent():
+    lru = MemoryLRU(max_bytes=30)
+    lru.put("a", "x" * 10)
+    lru.put("b", "y" * 10)
+    lru.put("c", "z" * 10)
+    assert lru.get("a") == "x" * 10  # "b" is now the least recently used
+
+    lru.put("d", "w" * 10)
+
+    assert lru.bytes_used <= 30
+    assert lru.get("b") is None
+    assert lru.get("a") is not None and lru.get("d") is not None
+    assert lru.evictions == 1
+
+
+def test_memory_lru_ignores_a_value_larger_than_the_whole_cache():
+    lru = MemoryLRU(max_bytes=10)
+    lru.put("small", "x" * 5)
+    lru.put("huge", "y" * 11)
+    assert lru.get("huge") is None
+    assert lru.get("small") == "x" * 5
+
+
+def test_disk_cache_evicts_least_recently_accessed_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10000)
+    values = {key: os.urandom(1000) for key in ("a", "b", "c")}
+    for key, value in values.items():
+        cache.put(key, value)
+    entry_size = cache.stats()["bytes_used"] // 3
+    cache.max_bytes = 3 * entry_size
+    assert cache.get("a") == values["a"]  # "b" is now the least recently accessed
+
+    cache.put("d", os.urandom(1000))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == values["a"]
+    stats = cache.stats()
+    assert stats["bytes_used"] <= cache.max_bytes
+    assert stats["evictions"] == 1
+    assert not os.path.exists(cache._path("b"))
+
+
+def test_disk_cache_tracks_its_size_across_replacements(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("a", os.urandom(1000))
+    cache.put("a", os.urandom(10))
+    cache.put("b", os.urandom(10))
+    assert cache.stats()["bytes_used"] == sum(os.path.getsize(cache._path(key)) for key in ("a", "b"))
+
+    # Another handle on the same directory, e.g. in a worker process, sees the same total
+    assert DiskCache(str(tmp_path), max_bytes=1 << 20).stats()["bytes_used"] == cache.stats()["bytes_used"]
+
+
+def test_disk_cache_treats_entries_older_than_max_age_as_expired(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("old", b"value")
+    time.sleep(0.05)
+
+    assert cache.get("old", max_age=3600) == b"value"
+    assert cache.get("old", max_age=0.01) is None
+    assert cache.get("old") is None  # The expired entry was removed
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_cache_expire_removes_only_old_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("old", b"value")
+    time.sleep(0.05)
+    cache.put("new", b"value")
+
+    assert cache.expire(0.04) == 1
+    assert cache.get("old") is None
+    assert cache.get("new") == b"value"
+
+
+def test_tiered_cache_serves_disk_hits_from_memory_afterwards(tmp_path):
+    writer = TieredCache(str(tmp_path), memory_bytes=1 << 20, disk_bytes=1 << 20)
+    writer.put("key", "value")
+
+    reader = TieredCache(str(tmp_path), memory_bytes=1 << 20, disk_bytes=1 << 20)
+    assert reader.get("key") == "value"
+    assert reader.get("key") == "value"
+    assert reader.disk.stats()["hits"] == 1
+    assert reader.memory.stats()["hits"] == 1
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from gateway import AdaptiveConcurrency, RateLimitTracker, parse_duration
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1s", 1.0),
+    ("20ms", 0.02),
+    ("6m0s", 360.0),
+    ("1h2m3.5s", 3723.5),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", ["", None, "soon"])
+def test_parse_duration_without_a_duration(value):
+    assert parse_duration(value) is None
+
+
+def test_concurrency_limit_grows_additively_and_halves_when_overloaded():
+    concurrency = AdaptiveConcurrency(initial=4, minimum=1, maximum=8)
+
+    async def main():
+        await concurrency.acquire()
+        concurrency.release(overloaded=False)
+        assert concurrency.limit == pytest.approx(4.25)
+        await concurrency.acquire()
+        concurrency.release(overloaded=True)
+        assert concurrency.limit == pytest.approx(2.125)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_passes_a_handed_over_slot_on():
+    concurrency = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+
+    async def main():
+        await concurrency.acquire()
+        second = asyncio.ensure_future(concurrency.acquire())
+        third = asyncio.ensure_future(concurrency.acquire())
+        await asyncio.sleep(0)
+        assert concurrency.waiting == 2
+
+        # The slot is handed to the second caller, which is cancelled before it gets to run
+        concurrency.release(overloaded=False, adjust=False)
+        second.cancel()
+
+        await asyncio.wait_for(third, timeout=1)
+        assert second.cancelled()
+        assert concurrency.in_flight == 1
+        assert concurrency.waiting == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    concurrency = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+
+    async def main():
+        await concurrency.acquire()
+        waiter = asyncio.ensure_future(concurrency.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert concurrency.waiting == 0
+
+        concurrency.release(overloaded=False, adjust=False)
+        assert concurrency.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_rate_limit_tracker_waits_for_the_reset_once_requests_run_out():
+    tracker = RateLimitTracker()
+    tracker.update({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "100ms"})
+
+    async def main():
+        start = time.monotonic()
+        await tracker.acquire(tokens=10)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.09
+    assert tracker.remaining_requests is None  # Past the reset, the budget is unknown again
+
+
+def test_rate_limit_tracker_reserves_tokens_locally():
+    tracker = RateLimitTracker()
+    tracker.update({"x-ratelimit-remaining-requests": "5", "x-ratelimit-remaining-tokens": "1000",
+                    "x-ratelimit-reset-tokens": "1m"})
+
+    async def main():
+        await tracker.acquire(tokens=600)
+        assert tracker.stats() == {"remaining_requests": 4, "remaining_tokens": 400}
+        # The next call no longer fits the token budget, so it waits for the reset
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(tracker.acquire(tokens=600), timeout=0.05)
+
+    asyncio.run(main())
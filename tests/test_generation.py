@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+from generation import condense_context
+from prompts import UseCase
+from retrieval import estimate_tokens, split_into_windows
+
+
+def make_context(pages: int, words_per_page: int) -> str:
+    return "\n".join(f"[Notes Page {page}]\n" + " ".join(f"word{page}" for _ in range(words_per_page))
+                     for page in range(1, pages + 1))
+
+
+class StubGateway:
+    """
+    Answers every map call with a short note naming the pages of its window.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, model, messages, phase, **params):
+        window = messages[-1]["content"]
+        self.calls.append((model, phase, window))
+        pages = [line for line in window.splitlines() if line.startswith("[Notes Page")]
+        note = f"notes for {pages[0]} to {pages[-1]}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=note))]), model
+
+
+def test_split_into_windows_respects_budget_and_keeps_every_page():
+    context = make_context(40, 50)
+    windows = split_into_windows(context, 500)
+    assert len(windows) > 1
+    assert all(estimate_tokens(window) <= 500 for window in windows)
+    joined = "\n".join(windows)
+    assert all(f"[Notes Page {page}]" in joined for page in range(1, 41))
+
+
+def test_context_within_one_window_is_not_condensed():
+    gateway = StubGateway()
+    context = make_context(3, 10)
+    assert asyncio.run(condense_context(gateway, UseCase.STUDY_GUIDE, context)) == (context, False)
+    assert gateway.calls == []
+
+
+def test_large_context_is_condensed_window_by_window(monkeypatch):
+    import generation
+    monkeypatch.setattr(generation, "MAP_WINDOW_TOKENS", 500)
+    gateway = StubGateway()
+    context = make_context(40, 50)
+
+    condensed, was_condensed = asyncio.run(condense_context(gateway, UseCase.STUDY_GUIDE, context))
+
+    assert was_condensed
+    assert len(gateway.calls) == len(split_into_windows(context, 500))
+    assert all(phase == "map" for _, phase, _ in gateway.calls)
+    assert condensed.startswith("notes for [Notes Page 1]")
+    assert "[Notes Page 40]" in condensed
@@ -0,0 +1,83 @@
+from rendering import IncrementalMarkdownRenderer, format_block
+
+
+class Placeholder:
+    def __init__(self):
+        self.content = None
+        self.renders = 0
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.content = body
+        self.renders += 1
+
+
+class Container:
+    """
+    Stands in for a streamlit container: records the placeholders handed out, in order.
+    """
+
+    def __init__(self):
+        self.placeholders = []
+
+    def empty(self):
+        placeholder = Placeholder()
+        self.placeholders.append(placeholder)
+        return placeholder
+
+    def rendered(self):
+        return [placeholder.content for placeholder in self.placeholders if placeholder.content]
+
+
+def stream(chunks, fps=0):
+    container = Container()
+    renderer = IncrementalMarkdownRenderer(container, fps=fps)
+    for chunk in chunks:
+        renderer.write(chunk)
+    return container, renderer
+
+
+def test_finished_paragraphs_are_committed_once():
+    container, renderer = stream(["First para", "graph.\n\nSecond ", "paragraph"])
+    first = container.placeholders[0]
+    assert first.content == "First paragraph."
+
+    renders = first.renders
+    renderer.write(" continues.")
+    assert first.renders == renders
+    assert container.placeholders[-1].content == "Second paragraph continues."
+
+    renderer.close()
+    assert container.rendered() == ["First paragraph.", "Second paragraph continues."]
+
+
+def test_display_math_is_its_own_block():
+    container, renderer = stream(["Intro text $$x^2", " + 1$$", "\n\nAfter."])
+    renderer.close()
+    assert container.rendered() == ["Intro text", "$$ x^2 + 1 $$", "After."]
+
+
+def test_blank_lines_inside_a_code_fence_do_not_split_the_block():
+    code = "```python\ndef f():\n\n    return 1\n```"
+    container, renderer = stream([code[:15], code[15:], "\n\nDone."])
+    renderer.close()
+    assert container.rendered() == [code, "Done."]
+
+
+def test_math_delimiters_inside_a_code_fence_are_left_alone():
+    code = "```\necho $$ \n```"
+    container, renderer = stream([code])
+    assert len(container.rendered()) == 1
+    renderer.close()
+    assert container.rendered() == [code.strip()]
+
+
+def test_tail_repaints_are_rate_limited():
+    container, renderer = stream(["a"] * 50, fps=1)
+    assert container.placeholders[0].renders == 1
+    renderer.close()
+    assert container.rendered() == ["a" * 50]
+
+
+def test_format_block_normalises_display_math():
+    assert format_block("$$\na + b\n$$\n") == "$$ a + b $$"
+    assert format_block("  plain text \n") == "plain text"
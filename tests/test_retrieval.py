@@ -0,0 +1,40 @@
+from retrieval import DocumentIndex, estimate_tokens, select_context
+
+PAGES = [
+    "[Notes Page 1]\nThe derivative is defined as the limit of the difference quotient.",
+    "[Notes Page 2]\nHousekeeping: office hours move to Thursday afternoon.",
+    "[Notes Page 3]\nExample problem: calculate the derivative of x squared.",
+    "[Notes Page 4]\nThe course schedule and grading policy are on the website.",
+]
+
+
+def build_index() -> DocumentIndex:
+    # One page per chunk
+    return DocumentIndex.build("\n".join(PAGES), max(estimate_tokens(page) for page in PAGES))
+
+
+def test_upload_within_budget_is_sent_whole():
+    index = build_index()
+    assert select_context([index], "derivative", token_budget=100000) == index.text()
+
+
+def test_many_small_slides_within_budget_are_all_kept():
+    slides = "\n".join(f"[Deck Page {page}]\nSlide {page} about housekeeping." for page in range(1, 41))
+    index = DocumentIndex.build(slides, 10)
+    context = select_context([index], "derivative definition", token_budget=60000)
+    assert "[Deck Page 40]" in context
+
+
+def test_over_budget_keeps_the_most_relevant_chunks():
+    index = build_index()
+    budget = index.token_counts[0] + index.token_counts[2]
+    context = select_context([index], "derivative definition example", token_budget=budget)
+    assert "Page 1" in context and "Page 3" in context
+    assert "Page 2" not in context and "Page 4" not in context
+
+
+def test_selected_chunks_keep_page_order():
+    index = build_index()
+    budget = index.token_counts[0] + index.token_counts[2]
+    context = select_context([index], "example calculate derivative defined", token_budget=budget)
+    assert context.index("Page 1") < context.index("Page 3")
@@ -0,0 +1,117 @@
+import asyncio
+
+from singleflight import SingleFlight, StreamFlight
+
+
+def test_concurrent_identical_jobs_run_once():
+    flight = SingleFlight()
+    runs = []
+
+    async def job():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", job) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(runs) == 1
+    assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+
+    async def job_for(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(flight.do("a", lambda: job_for("a")), flight.do("b", lambda: job_for("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert flight.stats()["started"] == 2
+
+
+def test_a_failed_job_raises_for_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    runs = []
+
+    async def failing():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        # The failure isn't cached: the next call starts a new job
+        retry = await asyncio.gather(flight.do("key", failing), return_exceptions=True)
+        return results + retry
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(runs) == 2
+
+
+def test_a_cancelled_caller_does_not_cancel_the_job_for_others():
+    flight = SingleFlight()
+
+    async def job():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", job))
+        second = asyncio.ensure_future(flight.do("key", job))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+
+def test_stream_subscribers_share_one_producer_and_see_every_item():
+    flight = StreamFlight()
+    runs = []
+
+    async def producer():
+        runs.append(1)
+        for item in ("a", "b", "c"):
+            await asyncio.sleep(0.005)
+            yield item
+
+    async def collect():
+        return [item async for item in flight.subscribe("key", producer)]
+
+    async def main():
+        first = asyncio.ensure_future(collect())
+        await asyncio.sleep(0.007)  # Join after the first item was produced
+        second = asyncio.ensure_future(collect())
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(runs) == 1
+    assert flight.stats()["coalesced"] == 1
+
+
+def test_stream_error_reaches_every_subscriber_after_the_items():
+    flight = StreamFlight()
+
+    async def producer():
+        yield "a"
+        await asyncio.sleep(0.005)
+        raise RuntimeError("stream broke")
+
+    async def collect(received):
+        async for item in flight.subscribe("key", producer):
+            received.append(item)
+
+    async def main():
+        received = [[], []]
+        results = await asyncio.gather(collect(received[0]), collect(received[1]), return_exceptions=True)
+        return received, results
+
+    received, results = asyncio.run(main())
+    assert received == [["a"], ["a"]]
+    assert all(isinstance(result, RuntimeError) for result in results)
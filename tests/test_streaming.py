@@ -0,0 +1,38 @@
+import random
+
+from streaming import LatexStreamSanitizer, sanitize_latex_content
+
+
+def feed_in_deltas(sanitizer: LatexStreamSanitizer, text: str, size: int) -> str:
+    return "".join(sanitizer.feed(text[start:start + size]) for start in range(0, len(text), size))
+
+
+def test_inline_math_is_not_held_back():
+    text = "The value $x$ is positive. " + "Some more prose about it. " * 100
+    sanitizer = LatexStreamSanitizer()
+    released = feed_in_deltas(sanitizer, text, 5)
+    assert released == text
+    assert sanitizer.flush() == ""
+
+
+def test_open_display_math_is_held_until_closed():
+    sanitizer = LatexStreamSanitizer()
+    assert sanitizer.feed("Intro $$ a + b") == "Intro "
+    assert sanitizer.feed(" $") == ""
+    assert sanitizer.feed("$ done") == "$$  a + b  $$ done"
+
+
+def test_trailing_dollar_is_held():
+    sanitizer = LatexStreamSanitizer()
+    assert sanitizer.feed("costs 5 $") == "costs 5 "
+    assert sanitizer.feed("$x$$") == "$$ x $$"
+
+
+def test_matches_whole_response_sanitizing():
+    rng = random.Random(0)
+    pieces = ["$", "$$", "[", "]", "a", "b", " ", "\n", "\\frac{1}{2}"]
+    for _ in range(2000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+        sanitizer = LatexStreamSanitizer()
+        streamed = feed_in_deltas(sanitizer, text, rng.randint(1, 6)) + sanitizer.flush()
+        assert streamed == sanitize_latex_content(text)